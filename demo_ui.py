@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
-import requests
-from requests.auth import HTTPBasicAuth
+# requests and dotenv are imported lazily where used to keep them off the first paint
 import streamlit as st
-import json
+import logging
+import sys
+import orjson
 import yaml
 import os
-from dotenv import load_dotenv
 import tiktoken
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Use the libyaml C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 # ------------------------------
 # Localisation import
@@ -17,28 +27,18 @@ from localization import t, set_lang, get_lang
 # Script to call OpenAI via WSO2
 # ------------------------------
 
-# Load environment variables from .env file
+# Load environment variables from .env file; variables already set (e.g. in containers) take precedence
+from dotenv import load_dotenv
 load_dotenv()
 
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
-
-# Load prompts configuration
-with open("prompts.yaml", "r") as f:
-    prompts_config = yaml.safe_load(f)
-
-# Load applications configuration
-with open("applications.yaml", "r") as f:
-    applications_config = yaml.safe_load(f)
-    # Filter only enabled applications and get available application keys
-    enabled_applications = { key: app_config for key, app_config in applications_config ["applications"].items()                       
-    if app_config.get("enabled", True)} 
-    applications_config["applications"] = enabled_applications
-    # Get available applications
-    application_keys = list(applications_config["applications"].keys())
-    if not application_keys:
-        print("ERROR: No applications are configured or enabled.")
-        exit(1)
+# Request/response logging; set LOG_LEVEL=DEBUG to include headers and bodies
+logger = logging.getLogger("aigateway")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not logger.handlers:
+    _log_handler = logging.StreamHandler(sys.stdout)
+    _log_handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(_log_handler)
+    logger.propagate = False
 
 # Security helper functions
 def mask_sensitive_data(text, mask_char="*", visible_chars=4):
@@ -56,35 +56,194 @@ def sanitize_headers_for_logging(headers):
             safe_headers['Authorization'] = f"{auth_parts[0]} {mask_sensitive_data(auth_parts[1])}"
     return safe_headers
 
+def decode_body(raw):
+    """Decode a raw response body for display or logging"""
+    return raw.decode("utf-8", "replace")
+
+def _guardrail_message(error_json):
+    message = error_json.get("message")
+    return message if isinstance(message, dict) else {}
+
+# (predicate, extractor) pairs for guardrail (900514) errors; the first matching predicate
+# wins. Assessments are preferred, then actionReason, then the original message.
+GUARDRAIL_REASON_EXTRACTORS = [
+    (lambda e: isinstance(_guardrail_message(e).get("assessments"), dict) and "invalidUrls" in e["message"]["assessments"],
+     lambda e: t('blocked_url', urls=", ".join(e["message"]["assessments"]["invalidUrls"]))),
+    # An empty assessments string falls through to actionReason
+    (lambda e: isinstance(_guardrail_message(e).get("assessments"), str) and e["message"]["assessments"],
+     lambda e: e["message"]["assessments"]),
+    (lambda e: "actionReason" in _guardrail_message(e),
+     lambda e: e["message"]["actionReason"]),
+    (lambda e: "message" in e and "description" in e,
+     lambda e: str(e["message"] + " : " + e["description"])),
+    (lambda e: "message" in e,
+     lambda e: str(e["message"])),
+]
+
+def extract_block_reason(error_json):
+    """Get a readable blocking reason from a guardrail error response"""
+    for predicate, extractor in GUARDRAIL_REASON_EXTRACTORS:
+        if predicate(error_json):
+            return extractor(error_json)
+    return str(error_json)
+
+def iter_chat_completion_deltas(response, received):
+    """Yield the content deltas of a streamed (SSE) chat completion as they arrive,
+    appending each one to received so partial text survives a broken stream"""
+    try:
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[len(b"data:"):].strip()
+            if data == b"[DONE]":
+                break
+            choices = orjson.loads(data).get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                received.append(delta)
+                yield delta
+    finally:
+        response.close()
+
+@st.cache_resource(show_spinner=False)
+def get_token_encoding(model_name):
+    """Load the tiktoken encoding for a model once per process"""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # Default to cl100k_base for models tiktoken does not know (e.g. non-OpenAI providers)
+        return tiktoken.get_encoding("cl100k_base")
+
+# Below this length, ASCII text is usually within about one token of the BPE count by word
+# count. Non-ASCII text (CJK, emoji) encodes to several tokens per character, so it always
+# goes through BPE.
+SHORT_TEXT_TOKEN_ESTIMATE_CHARS = 16
+
+def estimate_tokens(text):
+    """Rough token estimate: word count, or 1 token ≈ 4 characters for long unbroken text"""
+    return max(1, len(text.split()), len(text) // 4)
+
 def count_tokens(text, model_name="gpt-4"):
     """Count tokens in text using OpenAI's tiktoken library"""
+    if len(text) < SHORT_TEXT_TOKEN_ESTIMATE_CHARS and text.isascii():
+        return estimate_tokens(text)
     try:
-        # Map common model names to tiktoken encodings
-        model_mapping = {
-            "gpt-4": "cl100k_base",
-            "gpt-4o": "cl100k_base",
-            "gpt-3.5-turbo": "cl100k_base",
-            "text-davinci-003": "p50k_base",
-            "text-davinci-002": "p50k_base"
-        }
-
-        # Default to cl100k_base for most modern models
-        encoding_name = model_mapping.get(model_name.lower(), "cl100k_base")
-        encoding = tiktoken.get_encoding(encoding_name)
-        return len(encoding.encode(text))
+        encoding = get_token_encoding(model_name.lower())
+        # encode_ordinary skips the special-token check; user text is counted as plain text
+        return len(encoding.encode_ordinary(text))
     except Exception as e:
-        print(f"[WARNING] Token counting failed: {e}")
-        # Fallback: rough estimation (1 token ≈ 4 characters)
-        return len(text) // 4
+        logger.warning("Token counting failed: %s", e)
+        # Fallback: rough estimation
+        return estimate_tokens(text)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_count_tokens(text: str, model: str) -> int:
+    """Count tokens, memoized by (text, model) so unchanged prompts are not re-tokenized on rerun"""
+    return count_tokens(text, model)
+
+def load_provider_env_config(provider_name):
+    """Load provider configuration from environment variables"""
+    return {
+        "CHAT_COMPLETIONS_URL": os.getenv(f"{provider_name.upper()}_CHAT_COMPLETIONS_URL"),
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_executor():
+    """Background workers for warming up slow, input-independent calls"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+def run_with_script_ctx(ctx, fn, *args):
+    # Attach the session's script context so st.cache_* calls work from the worker thread,
+    # and detach it afterwards so the pooled thread does not keep the session alive
+    add_script_run_ctx(threading.current_thread(), ctx)
+    try:
+        return fn(*args)
+    finally:
+        add_script_run_ctx(threading.current_thread(), None)
+
+def validate_provider_config(provider_config, required_fields):
+    missing = [field for field in required_fields if field not in provider_config or provider_config[field] is None]
+    if missing:
+        st.error(t('missing_fields', fields=", ".join(missing)))
+        st.error(t('env_config_help'))
+        st.stop()
+
+def validate_application_config(application_config, required_fields):
+    missing = [field for field in required_fields if field not in application_config or application_config[field] is None]
+    if missing:
+        st.error(t('missing_fields', fields=", ".join(missing)))
+        st.error(t('env_config_help'))
+        st.stop()
+
+def load_yaml_file(path):
+    """Load a YAML file with the fastest available safe loader"""
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+@st.cache_resource(show_spinner=False)
+def load_config(mtime: float) -> dict:
+    """Load config.yaml merged with environment variables, keeping only enabled providers"""
+    config = load_yaml_file("config.yaml")
+
+    # Merge config.yaml with environment variables
+    for provider_name in config["providers"]:
+        env_config = load_provider_env_config(provider_name)
+        config["providers"][provider_name].update(env_config)
+
+    # Filter only enabled providers
+    config["providers"] = {name: provider_config for name, provider_config in config["providers"].items()
+                           if provider_config.get("ENABLED", True)}
+
+    # Validate provider configurations; st.stop() on failure means invalid configs are never cached
+    provider_required_fields = ["CHAT_COMPLETIONS_URL"]
+    for provider_config in config["providers"].values():
+        validate_provider_config(provider_config, provider_required_fields)
+
+    # Security warning for demo operator, logged once per loaded config rather than on every rerun
+    if not config.get("USETLS", True):
+        logger.warning("⚠️  [SECURITY WARNING] SSL/TLS verification is DISABLED. This is insecure and should only be used for localhost/demo purposes!")
+    else:
+        logger.info("🔒 [SECURITY] SSL/TLS verification is ENABLED. Connections are secure.")
+    return config
+
+@st.cache_resource(show_spinner=False)
+def load_prompts(mtime: float):
+    """Load the predefined prompts from prompts.yaml as (prompt names, text by name)"""
+    prompts_config = load_yaml_file("prompts.yaml")
+    prompts_by_name = {prompt['name']: prompt['text'] for prompt in prompts_config['prompts']}
+    return list(prompts_by_name), prompts_by_name
+
+@st.cache_resource(show_spinner=False)
+def load_applications(mtime: float) -> dict:
+    """Load applications.yaml, keeping only enabled applications"""
+    applications_config = load_yaml_file("applications.yaml")
+    applications_config["applications"] = {key: app_config for key, app_config in applications_config["applications"].items()
+                                           if app_config.get("enabled", True)}
+    return applications_config
+
+@st.cache_resource(show_spinner=False)
+def prepare_configs(config_mtime: float, applications_mtime: float):
+    """Load provider and application configs and precompute the providers available to each application"""
+    config = load_config(config_mtime)
+    applications_config = load_applications(applications_mtime)
+    application_keys = list(applications_config["applications"].keys())
+    providers_by_app = {
+        app_key: [provider for provider in app_config.get("providers", []) if provider in config["providers"]]
+        for app_key, app_config in applications_config["applications"].items()
+    }
+    return config, applications_config, application_keys, providers_by_app
+
+# Parsed once and shared across reruns (treat as read-only); the mtime keys pick up file edits
+config, applications_config, application_keys, providers_by_app = prepare_configs(
+    os.path.getmtime("config.yaml"), os.path.getmtime("applications.yaml")
+)
+prompt_options, prompts_by_name = load_prompts(os.path.getmtime("prompts.yaml"))
 
 # Get global SSL/TLS setting
 use_tls = config.get("USETLS", True)  # Default to True for security
 
-# Security warning for demo operator
-if not use_tls:
-    print("⚠️  [SECURITY WARNING] SSL/TLS verification is DISABLED. This is insecure and should only be used for localhost/demo purposes!")
-else:
-    print("🔒 [SECURITY] SSL/TLS verification is ENABLED. Connections are secure.")
+# Global User-Agent, sent by default on every gateway call
+global_user_agent = config.get("USER_AGENT") or "WSO2-AI-Gateway-Demo/1.0"
 
 # Load sensitive configuration from environment variables
 def load_application_env_config(application_key):
@@ -107,29 +266,50 @@ def load_application_env_config(application_key):
         "OAUTH_PROVIDER": f"{consumer_key}:{token_url}" if consumer_key and token_url else None
     }
 
-def load_provider_env_config(provider_name):
-    """Load provider configuration from environment variables"""
-    return {
-        "CHAT_COMPLETIONS_URL": os.getenv(f"{provider_name.upper()}_CHAT_COMPLETIONS_URL"),
-    }
-
-# Merge config.yaml with environment variables and filter enabled providers
-for provider_name in config["providers"]:
-    env_config = load_provider_env_config(provider_name)
-    config["providers"][provider_name].update(env_config)
-
-# Filter only enabled providers
-enabled_providers = {name: config for name, config in config["providers"].items()
-                    if config.get("ENABLED", True)}
-config["providers"] = enabled_providers
-
-# Filter only enabled applications
-enabled_applications = {key: app_config for key, app_config in applications_config["applications"].items()
-                       if app_config.get("enabled", True)}
-applications_config["applications"] = enabled_applications
-
-# OAuth token cache - stores tokens per OAuth provider
-oauth_token_cache = {}
+@st.cache_resource(show_spinner=False)
+def load_css():
+    """Build the <style> element for static/app.css once per process"""
+    with open(os.path.join("static", "app.css"), "r") as f:
+        return f"<style>{f.read()}</style>"
+
+# Every call sets a timeout so a stalled gateway cannot hang a rerun or a prefetch worker.
+# Read timeouts bound the wait between bytes, which also covers a stalled stream.
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+TOKEN_READ_TIMEOUT_SECONDS = 15
+CHAT_READ_TIMEOUT_SECONDS = 120
+# Connection failures are retried this many times, with backoff_factor seconds of backoff
+HTTP_CONNECT_RETRIES = 2
+HTTP_RETRY_BACKOFF_FACTOR = 0.2
+
+# Kept across reruns by st.cache_resource so TLS connections to the gateway stay warm
+@st.cache_resource(show_spinner=False)
+def get_http_session(user_agent):
+    """Shared HTTP session so the token and chat completions calls reuse pooled connections"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # Only connection failures are retried: every call is a POST, which urllib3 never
+    # retries on status, so a chat completion is not sent twice after a response
+    retries = Retry(total=HTTP_CONNECT_RETRIES, backoff_factor=HTTP_RETRY_BACKOFF_FACTOR)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Headers common to every call are set once instead of being rebuilt per request
+    session.headers.update({
+        "accept": "application/json",
+        "User-Agent": user_agent,
+    })
+    return session
+
+# OAuth token cache - stores tokens per OAuth provider, kept in session state so it survives reruns
+oauth_token_cache = st.session_state.setdefault("oauth_token_cache", {})
+
+# Refresh tokens slightly before they expire to avoid using one that lapses in flight
+TOKEN_EXPIRY_MARGIN_SECONDS = 30
+# Upper bound on cached tokens; expired entries are evicted first, then the oldest
+TOKEN_CACHE_MAX_ENTRIES = 64
 
 def get_oauth_provider_key(provider_config):
     """Generate a unique key for OAuth provider identification"""
@@ -137,23 +317,39 @@ def get_oauth_provider_key(provider_config):
 
 def get_cached_token(oauth_provider_key):
     """Get cached OAuth token if still valid"""
-    if oauth_provider_key in oauth_token_cache:
-        token_info = oauth_token_cache[oauth_provider_key]
-        # Simple check - in production, you'd check expiration time
-        if token_info.get("access_token"):
+    token_info = oauth_token_cache.get(oauth_provider_key)
+    if token_info:
+        if token_info.get("access_token") and token_info["expires_at"] > time.monotonic():
             return token_info["access_token"]
+        # Expired: drop it so a fresh token is requested
+        oauth_token_cache.pop(oauth_provider_key, None)
     return None
 
+def evict_expired_tokens():
+    """Remove expired tokens and keep the cache within TOKEN_CACHE_MAX_ENTRIES"""
+    now = time.monotonic()
+    for key, token_info in list(oauth_token_cache.items()):
+        if token_info["expires_at"] <= now:
+            oauth_token_cache.pop(key, None)
+    # Dicts keep insertion order, so the first keys are the oldest tokens
+    while len(oauth_token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+        oauth_token_cache.pop(next(iter(oauth_token_cache)), None)
+
 def cache_token(oauth_provider_key, token_response):
     """Cache OAuth token response"""
     if token_response and "access_token" in token_response:
+        expires_in = float(token_response.get("expires_in") or 3600)
+        oauth_token_cache.pop(oauth_provider_key, None)
+        evict_expired_tokens()
         oauth_token_cache[oauth_provider_key] = {
             "access_token": token_response["access_token"],
             "token_type": token_response.get("token_type", "Bearer"),
             "expires_in": token_response.get("expires_in"),
-            # In production, store actual expiration timestamp
+            # Short-lived tokens keep at least half their lifetime, so they are not
+            # treated as already expired and re-requested on every rerun
+            "expires_at": time.monotonic() + max(expires_in - TOKEN_EXPIRY_MARGIN_SECONDS, expires_in / 2),
         }
-        print(f"[LOG] Cached token for OAuth provider: {oauth_provider_key}")
+        logger.info("Cached token for OAuth provider: %s", oauth_provider_key)
 
 def acquire_oauth_token(application_config):
     """Acquire OAuth token for the application, using cache when possible"""
@@ -162,7 +358,7 @@ def acquire_oauth_token(application_config):
     # Try to use cached token first
     cached_token = get_cached_token(oauth_provider_key)
     if cached_token:
-        print(f"[LOG] Using cached token for OAuth provider: {oauth_provider_key}")
+        logger.info("Using cached token for OAuth provider: %s", oauth_provider_key)
         return cached_token
 
     # Request new token
@@ -174,51 +370,35 @@ def acquire_oauth_token(application_config):
         "grant_type": "client_credentials"
     }
 
-    print(f"[LOG] Requesting new token from: {token_url} with client_id: {consumer_key}")
-    token_headers = {
-        "User-Agent": config.get("USER_AGENT", "WSO2-AI-Gateway-Demo/1.0")
-    }
-    token_response = requests.post(
+    logger.info("Requesting new token from: %s with client_id: %s", token_url, consumer_key)
+    from requests.auth import HTTPBasicAuth
+
+    token_response = get_http_session(global_user_agent).post(
         token_url,
         data=token_data,
-        headers=token_headers,
         auth=HTTPBasicAuth(consumer_key, consumer_secret),
-        verify=use_tls
+        verify=use_tls,
+        timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, TOKEN_READ_TIMEOUT_SECONDS)
     )
 
-    print(f"[LOG] Token response status: {token_response.status_code}")
+    logger.info("Token response status: %s", token_response.status_code)
     if token_response.status_code == 200:
-        token_json = token_response.json()
+        token_json = orjson.loads(token_response.content)
         access_token = token_json.get("access_token")
         if not access_token:
-            print("[ERROR] No access token in response!")
+            logger.error("No access token in response!")
             raise Exception(t('no_access_token'))
 
         # Cache the token
         cache_token(oauth_provider_key, token_json)
-        print(f"[LOG] Access token acquired successfully for OAuth provider: {oauth_provider_key}")
+        logger.info("Access token acquired successfully for OAuth provider: %s", oauth_provider_key)
         return access_token
     else:
-        print(f"[ERROR] Token request failed with status: {token_response.status_code}")
+        logger.error("Token request failed with status: %s", token_response.status_code)
         raise Exception(t('token_error', status=token_response.status_code))
 
-def validate_provider_config(provider_config, required_fields):
-    missing = [field for field in required_fields if field not in provider_config or provider_config[field] is None]
-    if missing:
-        st.error(t('missing_fields', fields=", ".join(missing)))
-        st.error(t('env_config_help'))
-        st.stop()
 
-def validate_application_config(application_config, required_fields):
-    missing = [field for field in required_fields if field not in application_config or application_config[field] is None]
-    if missing:
-        st.error(t('missing_fields', fields=", ".join(missing)))
-        st.error(t('env_config_help'))
-        st.stop()
-
-
-# Get available applications
-application_keys = list(applications_config["applications"].keys())
+# Check if we have applications configured
 if not application_keys:
     st.error(t('no_applications_available'))
     st.stop()
@@ -243,37 +423,57 @@ if not selected_app:
     st.error(t('no_applications_available'))
     st.stop()
 
-selected_app_config = applications_config["applications"][selected_app]
 app_oauth_config = load_application_env_config(selected_app)
 
 # Validate application OAuth configuration
 app_required_fields = ["TOKEN_URL", "CONSUMER_KEY", "CONSUMER_SECRET"]
 validate_application_config(app_oauth_config, app_required_fields)
 
-# Filter providers available to this application
-available_provider_keys = []
-if "providers" in selected_app_config:
-    for provider in selected_app_config["providers"]:
-        if provider in config["providers"]:
-            available_provider_keys.append(provider)
+# Fetch the OAuth token in the background while the user is typing, so Send usually finds it
+# cached. A failed prefetch is not retried until Send, which reports the error.
+# Covers every connect attempt and its backoff, so a running prefetch is not outlasted and
+# followed by a second, concurrent token request
+TOKEN_PREFETCH_TIMEOUT_SECONDS = (
+    (HTTP_CONNECT_RETRIES + 1) * HTTP_CONNECT_TIMEOUT_SECONDS
+    + sum(HTTP_RETRY_BACKOFF_FACTOR * 2 ** attempt for attempt in range(HTTP_CONNECT_RETRIES))
+    + TOKEN_READ_TIMEOUT_SECONDS
+)
+token_prefetch = st.session_state.setdefault("token_prefetch", {})
+app_oauth_provider_key = get_oauth_provider_key(app_oauth_config)
+pending_token = token_prefetch.get(app_oauth_provider_key)
+if get_cached_token(app_oauth_provider_key) is None and (
+    pending_token is None or (pending_token.done() and pending_token.exception() is None)
+):
+    token_prefetch[app_oauth_provider_key] = get_prefetch_executor().submit(
+        run_with_script_ctx, get_script_run_ctx(), acquire_oauth_token, app_oauth_config
+    )
+
+# Providers available to this application
+available_provider_keys = providers_by_app[selected_app]
 
 if not available_provider_keys:
     st.error(t('no_providers_for_app'))
     st.stop()
 
-# Validate provider configurations
-provider_required_fields = ["CHAT_COMPLETIONS_URL"]
-for prov in config["providers"]:
-    validate_provider_config(config["providers"][prov], provider_required_fields)
+# Initialize session state for application-provider statistics
+def init_session_stats():
+    """Initialize session state counters for all application-provider combinations"""
+    stats = st.session_state.setdefault("stats", {})
+    for app_key, app_provider_keys in providers_by_app.items():
+        app_stats = stats.setdefault(app_key, {})
+        for provider in app_provider_keys:
+            app_stats.setdefault(provider, [0, 0])
 
-# Check if we have applications configured
-if not applications_config["applications"]:
-    st.error(t('no_applications_available'))
-    st.stop()
+init_session_stats()
 
+# Per-application statistics: {provider: [success, error]}, indexed with these constants
+SUCCESS, ERROR = 0, 1
+app_stats = st.session_state["stats"][selected_app]
 
+# Last response per (application, provider)
+last_responses = st.session_state.setdefault("last_response", {})
 
-# Initialize session state for application-provider statistics\ndef init_session_stats():\n    \"\"\"Initialize session state counters for all application-provider combinations\"\"\"\n    for app_key in application_keys:\n        app_config = applications_config[\"applications\"][app_key]\n        if \"providers\" in app_config:\n            for provider in app_config[\"providers\"]:\n                if provider in config[\"providers\"]:\n                    success_key = f\"{app_key}_{provider}_success\"\n                    error_key = f\"{app_key}_{provider}_error\"\n                    if success_key not in st.session_state:\n                        st.session_state[success_key] = 0\n                    if error_key not in st.session_state:\n                        st.session_state[error_key] = 0\n\ninit_session_stats()\n\n# Banner superior con logo WSO2 y colores corporativos theme-aware
+# Banner superior con logo WSO2 y colores corporativos theme-aware
 display_banner = f"""
 <div class='wso2-banner'>
     <img src='https://wso2.cachefly.net/wso2/sites/all/image_resources/wso2-branding-logos/wso2-logo-orange.png' alt='WSO2 Logo' class='wso2-logo'>
@@ -282,276 +482,28 @@ display_banner = f"""
 """
 st.markdown(display_banner, unsafe_allow_html=True)
 
+# Streamlit drops elements that are not re-emitted, so the styles are sent on every
+# rerun; only building the element is cached
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# Show dynamic counters for all providers defined in the YAML, followed by the interaction
+# section title; the separators, counters and title are rendered as a single element
+counter_cells = []
+for prov in available_provider_keys:
+    counter_cells.append(f"""
+    <div class='counter-cell'>
+        <div class='counter-success'>{t('success_count', provider=prov, count=app_stats[prov][SUCCESS])}</div>
+        <div class='counter-error'>{t('error_count', provider=prov, count=app_stats[prov][ERROR])}</div>
+    </div>""")
+titulo_interaccion = f"<div class='interaction-title' style='font-size:1.5rem;font-weight:bold;margin:20px 0 10px 0;'>{t('select_and_ask')}</div>"
 st.markdown(
-    """
-    <style>
-    /* Theme-aware banner styling */
-    .wso2-banner {
-        padding: 18px 0 10px 0;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        background-color: var(--background-color);
-        transition: background-color 0.2s ease;
-    }
-
-    .wso2-logo {
-        height: 44px;
-        margin-right: 24px;
-    }
-
-    .wso2-title {
-        font-size: 2.2rem;
-        font-weight: bold;
-        letter-spacing: 1px;
-        color: var(--text-color);
-    }
-
-    /* Light theme banner */
-    @media (prefers-color-scheme: light) {
-        .wso2-banner {
-            background-color: #fff;
-        }
-        .wso2-title {
-            color: #232323;
-        }
-    }
-
-    /* Dark theme banner */
-    @media (prefers-color-scheme: dark) {
-        .wso2-banner {
-            background-color: var(--background-color, #0e1117);
-        }
-        .wso2-title {
-            color: #fff;
-        }
-    }
-
-    /* Streamlit theme overrides for banner */
-    .stApp[data-theme="light"] .wso2-banner {
-        background-color: #fff;
-    }
-
-    .stApp[data-theme="light"] .wso2-title {
-        color: #232323;
-    }
-
-    .stApp[data-theme="dark"] .wso2-banner {
-        background-color: var(--background-color, #0e1117);
-    }
-
-    .stApp[data-theme="dark"] .wso2-title {
-        color: #fff;
-    }
-
-    /* Theme-aware section title styling */
-    .interaction-title {
-        margin-bottom: 10px;
-        color: var(--text-color);
-        text-decoration: none !important;
-        border: none !important;
-        border-bottom: none !important;
-        text-underline: none !important;
-        box-shadow: none !important;
-    }
-
-    /* Override any default h3 styling that might add underlines */
-    h3, .interaction-title {
-        text-decoration: none !important;
-        border-bottom: none !important;
-        box-shadow: none !important;
-        outline: none !important;
-    }
-
-    @media (prefers-color-scheme: light) {
-        .interaction-title {
-            color: #232323;
-        }
-    }
-
-    @media (prefers-color-scheme: dark) {
-        .interaction-title {
-            color: #fff;
-        }
-    }
-
-    .stApp[data-theme="light"] .interaction-title {
-        color: #232323;
-    }
-
-    .stApp[data-theme="dark"] .interaction-title {
-        color: #fff;
-    }
-
-    /* Theme-aware input styling */
-    textarea, .stTextInput > div > input, .stTextArea > div > textarea {
-        font-size: 1.1rem !important;
-        font-family: inherit !important;
-        border: 1.5px solid var(--text-color, #bbb) !important;
-        border-radius: 7px !important;
-        box-shadow: none !important;
-        padding: 8px 10px !important;
-        transition: border-color 0.2s ease !important;
-    }
-
-    textarea:focus, .stTextInput > div > input:focus, .stTextArea > div > textarea:focus {
-        border-color: #FF5000 !important;
-        box-shadow: 0 0 0 1px #FF5000 !important;
-    }
-
-    label, .stTextInput label, .stTextArea label {
-        font-weight: bold !important;
-        margin-bottom: 4px !important;
-    }
-
-    /* Light theme specific styles */
-    @media (prefers-color-scheme: light) {
-        textarea, .stTextInput > div > input, .stTextArea > div > textarea {
-            background-color: #fff !important;
-            color: #232323 !important;
-            border-color: #bbb !important;
-        }
-        label, .stTextInput label, .stTextArea label {
-            color: #232323 !important;
-        }
-    }
-
-    /* Dark theme specific styles */
-    @media (prefers-color-scheme: dark) {
-        textarea, .stTextInput > div > input, .stTextArea > div > textarea {
-            border-color: #666 !important;
-        }
-    }
-
-    /* Streamlit theme class overrides */
-    .stApp[data-theme="light"] textarea,
-    .stApp[data-theme="light"] .stTextInput > div > input,
-    .stApp[data-theme="light"] .stTextArea > div > textarea {
-        background-color: #fff !important;
-        color: #232323 !important;
-        border-color: #bbb !important;
-    }
-
-    .stApp[data-theme="light"] label,
-    .stApp[data-theme="light"] .stTextInput label,
-    .stApp[data-theme="light"] .stTextArea label {
-        color: #232323 !important;
-    }
-
-    .stApp[data-theme="dark"] textarea,
-    .stApp[data-theme="dark"] .stTextInput > div > input,
-    .stApp[data-theme="dark"] .stTextArea > div > textarea {
-        border-color: #666 !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
-st.markdown(
-    """
-    <style>
-    /* Theme-aware selectbox styling that works in both light and dark themes */
-    .stSelectbox > div[data-baseweb="select"] {
-        border: 2px solid var(--text-color, #333) !important;
-        border-radius: 8px !important;
-        transition: all 0.2s ease !important;
-        min-height: 44px !important;
-    }
-
-    .stSelectbox > div[data-baseweb="select"]:hover {
-        border-color: #FF5000 !important;
-        box-shadow: 0 0 0 1px #FF5000 !important;
-    }
-
-    /* More specific selector for the selected value text */
-    .stSelectbox > div[data-baseweb="select"] [role="combobox"] {
-        font-weight: 600 !important;
-        padding: 8px 12px !important;
-        font-size: 16px !important;
-        line-height: 1.4 !important;
-    }
-
-    /* Alternative selector for selected value */
-    .stSelectbox > div[data-baseweb="select"] > div[data-baseweb="input"] {
-        font-weight: 600 !important;
-        padding: 8px 12px !important;
-        font-size: 16px !important;
-    }
-
-    /* Ensure text is visible in selected state */
-    .stSelectbox > div[data-baseweb="select"] span {
-        font-weight: 600 !important;
-        font-size: 16px !important;
-        opacity: 1 !important;
-        color: inherit !important;
-    }
-
-    .stSelectbox label {
-        font-weight: 700 !important;
-        font-size: 16px !important;
-        margin-bottom: 8px !important;
-    }
-
-    /* Dark theme specific overrides */
-    @media (prefers-color-scheme: dark) {
-        .stSelectbox > div[data-baseweb="select"] {
-            border-color: #666 !important;
-        }
-
-        .stSelectbox label {
-            color: #fff !important;
-        }
-
-        .stSelectbox > div[data-baseweb="select"] [role="combobox"],
-        .stSelectbox > div[data-baseweb="select"] span {
-            color: #fff !important;
-        }
-    }
-
-    /* Streamlit dark theme class overrides */
-    .stApp[data-theme="dark"] .stSelectbox > div[data-baseweb="select"] {
-        border-color: #666 !important;
-        background-color: var(--background-color) !important;
-    }
-
-    .stApp[data-theme="dark"] .stSelectbox label {
-        color: #fff !important;
-    }
-
-    .stApp[data-theme="dark"] .stSelectbox > div[data-baseweb="select"] [role="combobox"],
-    .stApp[data-theme="dark"] .stSelectbox > div[data-baseweb="select"] span {
-        color: #fff !important;
-    }
-
-    /* Light theme text color */
-    .stApp[data-theme="light"] .stSelectbox > div[data-baseweb="select"] [role="combobox"],
-    .stApp[data-theme="light"] .stSelectbox > div[data-baseweb="select"] span {
-        color: #232323 !important;
-    }
-    </style>
-    """,
+    "<hr style='margin:0 0 20px 0;border:1px solid #FF5000;'>"
+    f"<div class='counter-row'>{''.join(counter_cells)}</div>"
+    "<hr style='margin:20px 0 20px 0;border:1px solid #FF5000;'>"
+    f"{titulo_interaccion}",
     unsafe_allow_html=True
 )
 
-st.markdown("<hr style='margin:0 0 20px 0;border:1px solid #FF5000;'>", unsafe_allow_html=True)
-
-
-# Show dynamic counters for all providers defined in the YAML
-cols = st.columns(len(available_provider_keys))
-for idx, prov in enumerate(available_provider_keys):
-    cols[idx].markdown(f"""
-    <div style='color:#FF5000;font-size:1.1rem;font-weight:bold;'>{t('success_count', provider=prov, count=st.session_state.get(f'{selected_app}_{prov}_success', 0))}</div>
-    <div style='color:#d32f2f;font-size:1.1rem;font-weight:bold;'>{t('error_count', provider=prov, count=st.session_state.get(f'{selected_app}_{prov}_error', 0))}</div>
-    """, unsafe_allow_html=True)
-
-st.markdown("<hr style='margin:20px 0 20px 0;border:1px solid #FF5000;'>", unsafe_allow_html=True)
-
-
-# Interaction section
-titulo_interaccion = f"<div class='interaction-title' style='font-size:1.5rem;font-weight:bold;margin:20px 0 10px 0;'>{t('select_and_ask')}</div>"
-st.markdown(titulo_interaccion, unsafe_allow_html=True)
-
 # Dynamic provider and label selection
 if available_provider_keys:
     provider = st.selectbox(
@@ -564,6 +516,7 @@ else:
     st.error("No providers available for this application")
     st.stop()
 provider_config = config["providers"][provider]
+response_key = (selected_app, provider)
 
 # Provider configuration is now loaded dynamically
 CHAT_COMPLETIONS_URL = provider_config["CHAT_COMPLETIONS_URL"]
@@ -575,27 +528,16 @@ answer_label = t('response_from', provider=provider)
 model = provider_config.get("MODEL", "")
 
 # Prompt selection dropdown
-prompt_options = [prompt['name'] for prompt in prompts_config['prompts']]
 selected_prompt = st.selectbox(t('select_prompt'), prompt_options, index=0)
 
-# Get the text for the selected prompt
-selected_prompt_text = ""
-for prompt in prompts_config['prompts']:
-    if prompt['name'] == selected_prompt:
-        selected_prompt_text = prompt['text']
-        break
-
 # Use selected prompt text or fallback to default
-if selected_prompt_text:
-    default_question = selected_prompt_text
-else:
-    default_question = t('default_question')
+default_question = prompts_by_name.get(selected_prompt) or t('default_question')
 
 user_question = st.text_area(question_label, value=default_question, height=100, max_chars=5000)
 
 # Display token count
 if user_question:
-    token_count = count_tokens(user_question, model)
+    token_count = cached_count_tokens(user_question, model)
     st.markdown(f"<div style='color:#666; font-size:0.9rem; margin-top:5px; margin-bottom:15px;'>{t('token_count', count=token_count)}</div>", unsafe_allow_html=True)
 else:
     st.markdown("<div style='margin-bottom:10px;'></div>", unsafe_allow_html=True)
@@ -611,20 +553,25 @@ if st.button(t('send'), type="primary"):
         st.stop()
     # Step 1: Obtain access token automatically
     try:
+        # Wait for a running prefetch instead of requesting a second token; its errors are
+        # surfaced by the direct call below. One still queued behind other sessions' calls
+        # is cancelled and the token is requested directly.
+        pending_token = token_prefetch.pop(app_oauth_provider_key, None)
+        if pending_token is not None and not pending_token.cancel():
+            try:
+                pending_token.result(timeout=TOKEN_PREFETCH_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.warning("Token prefetch failed: %s", e)
         access_token = acquire_oauth_token(app_oauth_config)
         # Step 2: Make API call with obtained token
-        # Get User-Agent: provider-specific > global > default
-        user_agent = (
-            provider_config.get("USER_AGENT") or
-            config.get("USER_AGENT") or
-            "WSO2-AI-Gateway-Demo/1.0"
-        )
+        # accept and the global User-Agent come from the session defaults
         headers = {
-            "accept": "application/json",
             "Content-Type": "application/json",
             "Authorization": f"Bearer {access_token}",
-            "User-Agent": user_agent
         }
+        # Provider-specific User-Agent overrides the global one
+        if provider_config.get("USER_AGENT"):
+            headers["User-Agent"] = provider_config["USER_AGENT"]
         payload = {
             "model": model,
             "messages": [
@@ -636,94 +583,89 @@ if st.button(t('send'), type="primary"):
             "temperature": 0.7,
             "max_tokens": 2000
         }
-        payload_str = json.dumps(payload, ensure_ascii=False)
-        print(f"[LOG] JSON payload sent to model API:\n{json.dumps(payload, indent=2, ensure_ascii=False)}")
-        print(f"[LOG] Sending request to: {CHAT_COMPLETIONS_URL}")
-        print(f"[LOG] Request headers: {sanitize_headers_for_logging(headers)}")
-        print(f"[LOG] Request payload: {payload_str}")
-        api_response = requests.post(
+        # Providers with STREAM enabled return server-sent events, rendered as they arrive
+        stream_enabled = bool(provider_config.get("STREAM", False))
+        if stream_enabled:
+            payload["stream"] = True
+            headers["Accept"] = "text/event-stream"
+        # Serialized once to UTF-8 bytes, which are sent as-is
+        payload_bytes = orjson.dumps(payload)
+        logger.info("Sending request to: %s", CHAT_COMPLETIONS_URL)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request headers: %s", sanitize_headers_for_logging(headers))
+            logger.debug("Request payload: %s", payload_bytes.decode())
+        api_response = get_http_session(global_user_agent).post(
             CHAT_COMPLETIONS_URL,
             headers=headers,
-            data=payload_str,
-            verify=use_tls
+            data=payload_bytes,
+            verify=use_tls,
+            stream=stream_enabled,
+            timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, CHAT_READ_TIMEOUT_SECONDS)
         )
-        print(f"[LOG] API response status: {api_response.status_code}")
-        print(f"[LOG] API response body: {api_response.text}")
+        logger.info("API response status: %s", api_response.status_code)
+        if (
+            stream_enabled
+            and api_response.status_code == 200
+            and "text/event-stream" in api_response.headers.get("Content-Type", "")
+        ):
+            received = []
+            try:
+                st.write_stream(iter_chat_completion_deltas(api_response, received))
+            except Exception as ex:
+                # Counted once here rather than in the outer handler, keeping what arrived
+                logger.error("Exception reading API response stream: %s", ex)
+                app_stats[provider][ERROR] += 1
+                last_responses[response_key] = "".join(received) + "\n\n" + t('api_request_error', error=str(ex))
+            else:
+                app_stats[provider][SUCCESS] += 1
+                last_responses[response_key] = "".join(received)
+            st.rerun()
+        # Non-streamed responses (including errors and gateway-served JSON when streaming
+        # was requested) are handled below
+        # Read the body once as bytes; it is only decoded to text for logging or display
+        api_body = api_response.content
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API response body: %s", decode_body(api_body))
         if api_response.status_code == 200:
-            success_key = f"{selected_app}_{provider}_success"
-            if success_key not in st.session_state:
-                st.session_state[success_key] = 0
-            st.session_state[success_key] += 1
+            app_stats[provider][SUCCESS] += 1
             try:
-                result = api_response.json()
-                print(f"[LOG] API response JSON: {result}")
+                result = orjson.loads(api_body)
+                logger.debug("API response JSON: %s", result)
                 content = None
                 if "choices" in result and result["choices"]:
                     content = result["choices"][0]["message"]["content"]
-                st.session_state[f"last_response_{selected_app}_{provider}"] = content or str(result)
+                last_responses[response_key] = content or str(result)
             except Exception as ex:
-                print(f"[ERROR] Exception parsing API response JSON: {ex}")
-                st.session_state[f"last_response_{selected_app}_{provider}"] = api_response.text
+                logger.error("Exception parsing API response JSON: %s", ex)
+                last_responses[response_key] = decode_body(api_body)
             st.rerun()
         else:
-            error_key = f"{selected_app}_{provider}_error"
-            if error_key not in st.session_state:
-                st.session_state[error_key] = 0
-            st.session_state[error_key] += 1
+            app_stats[provider][ERROR] += 1
             try:
-                error_json = api_response.json()
-                print(f"[ERROR] API error JSON: {error_json}")
+                error_json = orjson.loads(api_body)
+                logger.error("API error JSON: %s", error_json)
                 if isinstance(error_json, dict) and str(error_json.get("code")) == "900514":
                     # Show actual blocking reason
-                    reason = None
-                    if (
-                        "message" in error_json
-                        and isinstance(error_json["message"], dict)
-                        and "assessments" in error_json["message"]
-                    ):
-                        assessments = error_json["message"]["assessments"]
-                        if isinstance(assessments, dict) and "invalidUrls" in assessments:
-                            invalid_urls = ", ".join(assessments["invalidUrls"])
-                            reason = t('blocked_url', urls=invalid_urls)
-                        elif isinstance(assessments, str):
-                            reason = assessments
-                    # If no assessments, try to show actionReason or original message
-                    if not reason:
-                        if (
-                            "message" in error_json
-                            and isinstance(error_json["message"], dict)
-                            and "actionReason" in error_json["message"]
-                        ):
-                            reason = error_json["message"]["actionReason"]
-                        elif "message" in error_json and "description" in error_json:
-                            reason = str(error_json["message"] +  " : " + error_json["description"])
-                        elif "message" in error_json:
-                            reason = str(error_json["message"])
-                        else:
-                            reason = str(error_json)
-                    st.session_state[f"last_response_{selected_app}_{provider}"] = reason
+                    last_responses[response_key] = extract_block_reason(error_json)
                 else:
-                    st.session_state[f"last_response_{selected_app}_{provider}"] = api_response.text
+                    last_responses[response_key] = decode_body(api_body)
             except Exception as ex:
-                print(f"[ERROR] Exception parsing API error JSON: {ex}")
-                st.session_state[f"last_response_{selected_app}_{provider}"] = t('unknown_error')
+                logger.error("Exception parsing API error JSON: %s", ex)
+                last_responses[response_key] = t('unknown_error')
             st.rerun()
     except Exception as e:
-        print(f"[ERROR] Exception in main request flow: {e}")
-        error_key = f"{selected_app}_{provider}_error"
-        if error_key not in st.session_state:
-            st.session_state[error_key] = 0
-        st.session_state[error_key] += 1
+        logger.error("Exception in main request flow: %s", e)
+        app_stats[provider][ERROR] += 1
         # Handle OAuth-specific errors differently
         error_message = str(e)
         if "token" in error_message.lower() or "oauth" in error_message.lower():
-            st.session_state[f"last_response_{selected_app}_{provider}"] = f"OAuth Error: {error_message}"
+            last_responses[response_key] = f"OAuth Error: {error_message}"
         else:
-            st.session_state[f"last_response_{selected_app}_{provider}"] = t('api_request_error', error=error_message)
+            last_responses[response_key] = t('api_request_error', error=error_message)
         st.rerun()
 
 # Display last response if it exists (after button)
-if f"last_response_{selected_app}_{provider}" in st.session_state:
+if response_key in last_responses:
     st.markdown("<div style='margin-top:20px;'></div>", unsafe_allow_html=True)
-    st.text_area(answer_label, value=st.session_state[f"last_response_{selected_app}_{provider}"], height=200)
+    st.text_area(answer_label, value=last_responses[response_key], height=200)
 
@@ -1,3 +1,12 @@
+import ast
+import json
+import keyword
+import os
+import string
+import sys
+import threading
+from types import MappingProxyType
+
 TRANSLATIONS = {
     'en': {
         'title': "API Manager - AI Gateway",
@@ -28,52 +37,92 @@ TRANSLATIONS = {
         'no_applications_available': "No applications are configured or enabled.",
         'no_providers_for_app': "No providers are available for the selected application.",
         'token_count': "Prompt tokens: {count}",
-    },
-    'es': {
-        'title': "API Manager - AI Gateway",
-        'select_provider': "Selecciona el proveedor:",
-        'select_prompt': "Selecciona un prompt:",
-        'ask_question': "Haz una pregunta a {provider}",
-        'response_from': "Respuesta de {provider}",
-        'send': "Enviar",
-        'success_count': "Llamadas exitosas a {provider}: {count}",
-        'error_count': "Llamadas incorrectas a {provider}: {count}",
-        'select_and_ask': "Selecciona el proveedor y haz tu pregunta.",
-        'missing_fields': "Faltan los siguientes campos en la configuración del proveedor: {fields}",
-        'no_access_token': "No se pudo obtener el access token.",
-        'token_error': "Error al obtener token. Estado: {status}",
-        'unknown_error': "Error desconocido.",
-        'api_request_error': "Error al realizar la solicitud a la API: {error}",
-        'blocked_url': "Se ha bloqueado la respuesta por contener una URL inválida o no accesible: {urls}",
-        'default_question': "Hola! ¿quién eres?",
-        'env_config_help': "Por favor asegúrate de que tu archivo .env contiene las credenciales requeridas. Consulta .env.example como referencia.",
-        'empty_question_error': "Por favor ingresa una pregunta antes de enviar.",
-        'question_too_long': "La pregunta es demasiado larga. Máximo {max_length} caracteres permitidos.",
-        'tls_disabled_warning': "⚠️ La verificación SSL/TLS está DESHABILITADA. ¡Las conexiones NO son seguras!",
-        'tls_enabled_status': "🔒 La verificación SSL/TLS está HABILITADA. Las conexiones son seguras.",
-        'tls_status_label': "Estado de Seguridad",
-        'select_application': "Selecciona la aplicación:",
-        'app_provider_success': "Llamadas exitosas de {app} a {provider}: {count}",
-        'app_provider_error': "Llamadas incorrectas de {app} a {provider}: {count}",
-        'no_applications_available': "No hay aplicaciones configuradas o habilitadas.",
-        'no_providers_for_app': "No hay proveedores disponibles para la aplicación seleccionada.",
-        'token_count': "Prompt tokens: {count}",
     }
 }
 
+# Other languages live in locales/<lang>.json and are only loaded when selected
+_LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locales')
+_AVAILABLE_LANGS = {'en'}
+if os.path.isdir(_LOCALES_DIR):
+    _AVAILABLE_LANGS.update(name[:-len('.json')] for name in os.listdir(_LOCALES_DIR) if name.endswith('.json'))
+
+def _compile_template(template):
+    """Compile a template into a function taking its fields as keyword arguments"""
+    # Templates made only of plain {name} fields become an f-string lambda, which is
+    # cheaper to call than str.format; anything else falls back to str.format
+    fields = []
+    values = []
+    for literal, field, format_spec, conversion in string.Formatter().parse(template):
+        if literal:
+            values.append(ast.Constant(literal))
+        if field is None:
+            continue
+        if format_spec or conversion or not field.isidentifier() or keyword.iskeyword(field) or field == '_extra':
+            return template.format
+        if field not in fields:
+            fields.append(field)
+        values.append(ast.FormattedValue(ast.Name(field, ast.Load()), -1, None))
+    # Unused keyword arguments are accepted and ignored, as with str.format
+    args = ast.arguments(posonlyargs=[], args=[ast.arg(field) for field in fields], vararg=None,
+                         kwonlyargs=[], kw_defaults=[], kwarg=ast.arg('_extra'), defaults=[])
+    expression = ast.fix_missing_locations(ast.Expression(ast.Lambda(args, ast.JoinedStr(values))))
+    return eval(compile(expression, '<translation>', 'eval'))
+
+# Plain per-language dicts with interned keys, used by t(); TRANSLATIONS is re-exposed as a
+# read-only view of the loaded languages so it can be shared without defensive copies
+_TABLES = {}
+_VIEWS = {}
+# Precompiled formatters for every template with fields, per language
+_FORMATTERS = {}
+
+def _register(lang, texts):
+    table = {sys.intern(key): text for key, text in texts.items()}
+    formatters = {key: _compile_template(text) for key, text in table.items() if '{' in text}
+    _FORMATTERS[lang] = formatters
+    _VIEWS[lang] = MappingProxyType(table)
+    # Published last: set_lang treats a language in _TABLES as fully loaded
+    _TABLES[lang] = table
+
+_register('en', TRANSLATIONS['en'])
+TRANSLATIONS = MappingProxyType(_VIEWS)
+
+# Streamlit runs sessions in separate threads, so a language is loaded by one of them only
+_load_lock = threading.Lock()
+
+def _load(lang):
+    with open(os.path.join(_LOCALES_DIR, f'{lang}.json'), encoding='utf-8') as f:
+        _register(lang, json.load(f))
 
 _current_lang = 'en'
+# Translation table and formatters of the active language, rebound by set_lang so t() needs
+# a single string-keyed lookup
+_current_map = _TABLES['en']
+_current_formatters = _FORMATTERS['en']
 
 def set_lang(lang):
-    global _current_lang
-    if lang in TRANSLATIONS:
-        _current_lang = lang
-    else:
-        _current_lang = 'en'
+    global _current_lang, _current_map, _current_formatters
+    if lang not in _AVAILABLE_LANGS:
+        lang = 'en'
+    if lang not in _TABLES:
+        with _load_lock:
+            if lang not in _TABLES:
+                _load(lang)
+    _current_lang = lang
+    _current_map = _TABLES[lang]
+    _current_formatters = _FORMATTERS[lang]
 
 def get_lang():
     return _current_lang
 
 def t(key, **kwargs):
-    txt = TRANSLATIONS.get(_current_lang, TRANSLATIONS['en']).get(key, key)
-    return txt.format(**kwargs) if kwargs else txt
+    if not kwargs:
+        # Keys are a closed catalog, so a miss is rare; try/except is free on the hit path
+        try:
+            return _current_map[key]
+        except KeyError:
+            return key
+    formatter = _current_formatters.get(key)
+    if formatter is None:
+        # Untranslated key or template without fields
+        return _current_map.get(key, key).format(**kwargs)
+    return formatter(**kwargs)